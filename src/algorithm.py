@@ -1,8 +1,8 @@
 import numpy as np
-import random
-import copy
+from typing import Optional
 
-from src.model import Solution, Settings, calculate_cost, generate_random_solution
+from src.fastkernels import _simulate
+from src.model import Solution, Settings, calculate_cost, batch_cost, generate_random_solution
 
 
 class BeesSolver:
@@ -11,7 +11,8 @@ class BeesSolver:
     """
 
     def __init__(self, settings: Settings, population_size: int, modules_mutations: int, rockets_type_mutations: int,
-                 elite_sites: int, normal_sites: int, elite_site_size: int, normal_site_size: int) -> None:
+                 elite_sites: int, normal_sites: int, elite_site_size: int, normal_site_size: int,
+                 seed: Optional[int] = None) -> None:
         """
         Args:
             settings (Settings): the settings of the problem
@@ -22,6 +23,8 @@ class BeesSolver:
             normal_sites (int): the number of normal sites that are maintained in the population
             elite_site_size (int): the size of the elite site
             normal_site_size (int): the size of each normal site
+            seed (int, optional): the seed of the random number generator of the solver, which is recreated whenever
+                                  the population is initialized. The results are not reproducible if not given
 
         Returns:
             None
@@ -34,103 +37,53 @@ class BeesSolver:
         self.normal_sites = normal_sites
         self.elite_site_size = elite_site_size
         self.normal_site_size = normal_site_size
-        self.population = []
+        self.seed = seed
+        self.rng = np.random.default_rng(seed)
 
-    def __mutate_rockets_type_allocation(self, solution: Solution) -> None:
-        """
-        Mutates the type of rocket allocation for a given solution
-
-        Args:
-            solution (Solution): the solution to mutate
-
-        Returns:
-            None
-        """
-        rocket_index = random.randrange(self.settings.num_rockets)
-        new_rocket_type = random.randrange(self.settings.num_rocket_types)
-        solution.rocket_type_allocation[rocket_index] = new_rocket_type
-
-    def __mutate_modules_allocation(self, solution: Solution) -> None:
-        """
-        Mutates the module allocation for a given solution
-
-        Args:
-            solution (Solution): the solution to mutate
-
-        Returns:
-            None
-        """
-        rocket_capacities = self.settings.rocket_capacity - solution.module_allocation.sum(axis=1)
-
-        module_type_index = random.randrange(self.settings.num_module_types)
-
-        to_rocket_index = random.choice(np.argwhere(rocket_capacities > 0).flatten())
-
-        from_rocket_index = random.choice(np.argwhere(solution.module_allocation[:, module_type_index] > 0).flatten())
-
-        max_module_amount = min(solution.module_allocation[from_rocket_index, module_type_index],
-                                rocket_capacities[to_rocket_index])
-
-        module_amount = random.randint(1, max_module_amount)
-        solution.module_allocation[from_rocket_index, module_type_index] -= module_amount
-        solution.module_allocation[to_rocket_index, module_type_index] += module_amount
+        # The population is kept as stacked arrays, one row per solution
+        self.rocket_type_allocations = np.empty((0, settings.num_rockets), dtype=np.int8)
+        self.module_allocations = np.empty((0, settings.num_rockets, settings.num_module_types), dtype=np.int32)
+        self.costs = np.empty(0, dtype=np.float64)
+        self.__buffers = ()
 
-    def __mutate_solution(self, solution: Solution) -> None:
+    def __simulate(self, iterations: int) -> None:
         """
-        Mutates a given solution by calling _mutate_rockets_type_allocation() and _mutate_modules_allocation() based on
-        the defined number of mutations
+        Evolves the population for a given number of iterations in a single call of the compiled kernel
 
         Args:
-            solution (Solution): the solution to mutate
+            iterations (int): the number of iterations to evolve the population
 
         Returns:
             None
         """
-        for _ in range(self.modules_mutations):
-            self.__mutate_modules_allocation(solution)
-
-        for _ in range(self.rockets_type_mutations):
-            self.__mutate_rockets_type_allocation(solution)
-
-    def __find_best_neighbour(self, solution: Solution, neighbours_count: int) -> Solution:
-        """
-        Finds the best neighbouring solution for a given solution by creating a number of mutated solutions and
-        selecting the best one based on the cost
-
-        Args:
-            solution (Solution): the solution to find the best neighbour for
-            neighbours_count (int): the number of neighbours to create
-
-        Returns:
-            solution (Solution): the best neighbouring solution
-        """
-        neighbours = [copy.deepcopy(solution) for _ in range(neighbours_count)]
-
-        for n in neighbours:
-            self.__mutate_solution(n)
-
-        neighbours.append(solution)
-
-        return sorted(neighbours, key=lambda sol: calculate_cost(sol, self.settings))[0]
+        settings = self.settings
+        population_size = len(self.costs)
+
+        # The scratch buffers of the compiled kernel are kept between calls and only reallocated when the population
+        # size or the number of mutations changes, since their shapes set the number of mutations
+        module_moves_shape = (population_size, self.modules_mutations, 4)
+        rocket_changes_shape = (population_size, self.rockets_type_mutations, 3)
+        if not self.__buffers or self.__buffers[0].shape != module_moves_shape or \
+                self.__buffers[1].shape != rocket_changes_shape:
+            module_moves = np.empty(module_moves_shape, dtype=np.int64)
+            rocket_changes = np.empty(rocket_changes_shape, dtype=np.int64)
+            self.__buffers = (module_moves, rocket_changes, np.empty_like(module_moves), np.empty_like(rocket_changes),
+                              np.empty((population_size, settings.num_rockets), dtype=np.int64))
+
+        _simulate(self.rocket_type_allocations, self.module_allocations, self.costs, settings.additional_fuel_costs,
+                  settings.fuel_costs, settings.module_amounts, settings.rocket_capacity,
+                  iterations, int(self.rng.integers(2 ** 32)), self.elite_sites, self.normal_sites,
+                  self.elite_site_size, self.normal_site_size, *self.__buffers)
 
     def simulate_population(self) -> None:
         """
-        Simulates the population by applying the _find_best_neighbour() function to the elite and normal sites of the
-        population and generating new random solutions for the rest
+        Simulates the population by replacing the solutions of the elite and normal sites of the population with their
+        best neighbours and generating new random solutions for the rest
 
         Returns:
             None
         """
-        self.population.sort(key=lambda sol: calculate_cost(sol, self.settings))
-
-        for i in range(0, self.elite_sites):
-            self.population[i] = self.__find_best_neighbour(self.population[i], self.elite_site_size)
-
-        for i in range(self.elite_sites, self.elite_sites + self.normal_sites):
-            self.population[i] = self.__find_best_neighbour(self.population[i], self.normal_site_size)
-
-        for i in range(self.elite_sites + self.normal_sites, len(self.population)):
-            self.population[i] = generate_random_solution(self.settings)
+        self.__simulate(1)
 
     def find_best_solution(self, iterations: int) -> Solution:
         """
@@ -142,12 +95,11 @@ class BeesSolver:
         Returns:
             solution (Solution): the best solution found
         """
-        self.population = [generate_random_solution(self.settings) for _ in range(self.population_size)]
+        self.init_population()
+        self.__simulate(iterations)
 
-        for _ in range(iterations):
-            self.simulate_population()
-
-        return self.population[0]
+        # Copy the best solution so that further simulation of the population does not change it
+        return Solution(self.rocket_type_allocations[0].copy(), self.module_allocations[0].copy())
 
     def init_population(self) -> None:
         """
@@ -156,7 +108,19 @@ class BeesSolver:
         Returns:
             None
         """
-        self.population = [generate_random_solution(self.settings) for _ in range(self.population_size)]
+        self.rng = np.random.default_rng(self.seed)
+
+        self.rocket_type_allocations = np.empty((self.population_size, self.settings.num_rockets), dtype=np.int8)
+        self.module_allocations = np.empty(
+            (self.population_size, self.settings.num_rockets, self.settings.num_module_types), dtype=np.int32)
+        self.costs = np.empty(self.population_size, dtype=np.float64)
+
+        for i in range(self.population_size):
+            solution = generate_random_solution(self.settings, self.rng)
+            self.rocket_type_allocations[i] = solution.rocket_type_allocation
+            self.module_allocations[i] = solution.module_allocation
+
+        self.costs[:] = batch_cost(self.rocket_type_allocations, self.module_allocations, self.settings)
 
     def current_cost(self) -> float:
         """
@@ -165,7 +129,7 @@ class BeesSolver:
         Returns:
             float: current cost of first solution from population
         """
-        return calculate_cost(self.population[0], self.settings)
+        return float(self.costs[0])
 
 
 if __name__ == "__main__":
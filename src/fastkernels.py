@@ -0,0 +1,418 @@
+import numpy as np
+from numba import njit, prange
+
+
+@njit('float64(int8[:], int32[:, :], float32[:, :], float32[:])', cache=True, fastmath=True)
+def _cost(rocket_type_allocation: np.ndarray, module_allocation: np.ndarray, additional_fuel_costs: np.ndarray,
+          fuel_costs: np.ndarray) -> float:
+    """
+    Calculates the total cost of an allocation using plain loops compiled by numba
+
+    Args:
+        rocket_type_allocation (np.ndarray): the allocation of rocket types
+        module_allocation (np.ndarray): the allocation of modules to each rocket
+        additional_fuel_costs (np.ndarray): the additional fuel costs for each rocket type and module type
+        fuel_costs (np.ndarray): the fuel costs for each rocket type
+
+    Returns:
+        cost (float): the total cost of the allocation
+    """
+    cost = 0.0
+    for i in range(module_allocation.shape[0]):
+        rocket_type = rocket_type_allocation[i]
+        cost += fuel_costs[rocket_type]
+        for j in range(module_allocation.shape[1]):
+            cost += module_allocation[i, j] * additional_fuel_costs[rocket_type, j]
+    return cost
+
+
+@njit('void(int32[:, :], int64)', cache=True)
+def _repair(allocation: np.ndarray, rocket_capacity: int) -> None:
+    """
+    Transfers modules in place from the most loaded rockets to the least loaded ones until no rocket exceeds its
+    capacity
+
+    Args:
+        allocation (np.ndarray): the allocation of modules to each rocket
+        rocket_capacity (int): the maximum capacity of each single rocket
+
+    Returns:
+        None
+    """
+    num_rockets, num_module_types = allocation.shape
+
+    rocket_module_counts = np.zeros(num_rockets, dtype=np.int64)
+    for i in range(num_rockets):
+        for j in range(num_module_types):
+            rocket_module_counts[i] += allocation[i, j]
+
+    while True:
+        # Find the rocket with the most modules and the one with the least modules
+        max_rocket_index = 0
+        min_rocket_index = 0
+        for i in range(1, num_rockets):
+            if rocket_module_counts[i] > rocket_module_counts[max_rocket_index]:
+                max_rocket_index = i
+            if rocket_module_counts[i] < rocket_module_counts[min_rocket_index]:
+                min_rocket_index = i
+
+        if rocket_module_counts[max_rocket_index] <= rocket_capacity:
+            break
+
+        # Find the module type with the most amount of modules in the rocket with the most modules
+        module_index = 0
+        for j in range(1, num_module_types):
+            if allocation[max_rocket_index, j] > allocation[max_rocket_index, module_index]:
+                module_index = j
+
+        # Transfer the modules from the rocket with the most modules to the one with the least
+        num_modules_to_transfer = min(allocation[max_rocket_index, module_index],
+                                      rocket_module_counts[max_rocket_index] - rocket_capacity)
+        allocation[max_rocket_index, module_index] -= num_modules_to_transfer
+        allocation[min_rocket_index, module_index] += num_modules_to_transfer
+        rocket_module_counts[max_rocket_index] -= num_modules_to_transfer
+        rocket_module_counts[min_rocket_index] += num_modules_to_transfer
+
+
+@njit(cache=True)
+def _mutate_modules_allocation(rocket_type_allocation: np.ndarray, module_allocation: np.ndarray,
+                               rocket_module_counts: np.ndarray, additional_fuel_costs: np.ndarray,
+                               rocket_capacity: int, module_moves: np.ndarray) -> float:
+    """
+    Transfers random amounts of modules between the rockets of an allocation in place
+
+    Args:
+        rocket_type_allocation (np.ndarray): the allocation of rocket types
+        module_allocation (np.ndarray): the allocation of modules to each rocket, mutated in place
+        rocket_module_counts (np.ndarray): the number of modules in each rocket, kept up to date in place
+        additional_fuel_costs (np.ndarray): the additional fuel costs for each rocket type and module type
+        rocket_capacity (int): the maximum capacity of each single rocket
+        module_moves (np.ndarray): the log filled with one (from rocket, to rocket, module type, amount) row per
+                                   transfer, its length is the number of transfers to perform
+
+    Returns:
+        cost_change (float): the change of the total cost caused by the transfers
+    """
+    num_rockets, num_module_types = module_allocation.shape
+
+    cost_change = 0.0
+
+    for k in range(module_moves.shape[0]):
+        module_moves[k] = 0
+        module_type_index = np.random.randint(0, num_module_types)
+
+        # The rockets are chosen by counting the matching ones and then walking to the randomly picked one, so no
+        # candidate list has to be built
+        candidates_count = 0
+        for i in range(num_rockets):
+            if rocket_module_counts[i] < rocket_capacity:
+                candidates_count += 1
+        if candidates_count == 0:
+            continue
+        to_rocket_index = -1
+        remaining = np.random.randint(0, candidates_count)
+        while remaining >= 0:
+            to_rocket_index += 1
+            if rocket_module_counts[to_rocket_index] < rocket_capacity:
+                remaining -= 1
+
+        candidates_count = 0
+        for i in range(num_rockets):
+            if module_allocation[i, module_type_index] > 0:
+                candidates_count += 1
+        if candidates_count == 0:
+            continue
+        from_rocket_index = -1
+        remaining = np.random.randint(0, candidates_count)
+        while remaining >= 0:
+            from_rocket_index += 1
+            if module_allocation[from_rocket_index, module_type_index] > 0:
+                remaining -= 1
+
+        max_module_amount = min(module_allocation[from_rocket_index, module_type_index],
+                                rocket_capacity - rocket_module_counts[to_rocket_index])
+
+        module_amount = np.random.randint(1, max_module_amount + 1)
+        cost_change += module_amount * (
+                additional_fuel_costs[rocket_type_allocation[to_rocket_index], module_type_index] -
+                additional_fuel_costs[rocket_type_allocation[from_rocket_index], module_type_index])
+
+        module_allocation[from_rocket_index, module_type_index] -= module_amount
+        module_allocation[to_rocket_index, module_type_index] += module_amount
+        rocket_module_counts[from_rocket_index] -= module_amount
+        rocket_module_counts[to_rocket_index] += module_amount
+
+        module_moves[k, 0] = from_rocket_index
+        module_moves[k, 1] = to_rocket_index
+        module_moves[k, 2] = module_type_index
+        module_moves[k, 3] = module_amount
+
+    return cost_change
+
+
+@njit(cache=True)
+def _mutate_rockets_type_allocation(rocket_type_allocation: np.ndarray, module_allocation: np.ndarray,
+                                    additional_fuel_costs: np.ndarray, fuel_costs: np.ndarray,
+                                    rocket_changes: np.ndarray) -> float:
+    """
+    Changes the types of random rockets of an allocation in place
+
+    Args:
+        rocket_type_allocation (np.ndarray): the allocation of rocket types, mutated in place
+        module_allocation (np.ndarray): the allocation of modules to each rocket
+        additional_fuel_costs (np.ndarray): the additional fuel costs for each rocket type and module type
+        fuel_costs (np.ndarray): the fuel costs for each rocket type
+        rocket_changes (np.ndarray): the log filled with one (rocket, old type, new type) row per change, its length is
+                                     the number of rocket type changes to perform
+
+    Returns:
+        cost_change (float): the change of the total cost caused by the rocket type changes
+    """
+    num_rockets, num_module_types = module_allocation.shape
+    cost_change = 0.0
+
+    for k in range(rocket_changes.shape[0]):
+        rocket_index = np.random.randint(0, num_rockets)
+        new_rocket_type = np.random.randint(0, fuel_costs.shape[0])
+        old_rocket_type = rocket_type_allocation[rocket_index]
+
+        cost_change += fuel_costs[new_rocket_type] - fuel_costs[old_rocket_type]
+        for j in range(num_module_types):
+            cost_change += module_allocation[rocket_index, j] * (additional_fuel_costs[new_rocket_type, j] -
+                                                                 additional_fuel_costs[old_rocket_type, j])
+
+        rocket_type_allocation[rocket_index] = new_rocket_type
+
+        rocket_changes[k, 0] = rocket_index
+        rocket_changes[k, 1] = old_rocket_type
+        rocket_changes[k, 2] = new_rocket_type
+
+    return cost_change
+
+
+@njit(cache=True)
+def _revert_mutations(rocket_type_allocation: np.ndarray, module_allocation: np.ndarray,
+                      rocket_module_counts: np.ndarray, module_moves: np.ndarray, rocket_changes: np.ndarray) -> None:
+    """
+    Undoes the logged mutations of an allocation in place, in reverse order
+
+    Args:
+        rocket_type_allocation (np.ndarray): the allocation of rocket types
+        module_allocation (np.ndarray): the allocation of modules to each rocket
+        rocket_module_counts (np.ndarray): the number of modules in each rocket
+        module_moves (np.ndarray): the logged module transfers
+        rocket_changes (np.ndarray): the logged rocket type changes
+
+    Returns:
+        None
+    """
+    for k in range(rocket_changes.shape[0] - 1, -1, -1):
+        rocket_type_allocation[rocket_changes[k, 0]] = rocket_changes[k, 1]
+
+    for k in range(module_moves.shape[0] - 1, -1, -1):
+        from_rocket_index, to_rocket_index, module_type_index, module_amount = module_moves[k]
+        module_allocation[from_rocket_index, module_type_index] += module_amount
+        module_allocation[to_rocket_index, module_type_index] -= module_amount
+        rocket_module_counts[from_rocket_index] += module_amount
+        rocket_module_counts[to_rocket_index] -= module_amount
+
+
+@njit(cache=True)
+def _apply_mutations(rocket_type_allocation: np.ndarray, module_allocation: np.ndarray, module_moves: np.ndarray,
+                     rocket_changes: np.ndarray) -> None:
+    """
+    Replays the logged mutations on an allocation in place
+
+    Args:
+        rocket_type_allocation (np.ndarray): the allocation of rocket types
+        module_allocation (np.ndarray): the allocation of modules to each rocket
+        module_moves (np.ndarray): the logged module transfers
+        rocket_changes (np.ndarray): the logged rocket type changes
+
+    Returns:
+        None
+    """
+    for k in range(module_moves.shape[0]):
+        from_rocket_index, to_rocket_index, module_type_index, module_amount = module_moves[k]
+        module_allocation[from_rocket_index, module_type_index] -= module_amount
+        module_allocation[to_rocket_index, module_type_index] += module_amount
+
+    for k in range(rocket_changes.shape[0]):
+        rocket_type_allocation[rocket_changes[k, 0]] = rocket_changes[k, 2]
+
+
+@njit(cache=True)
+def _seed(seed: int) -> None:
+    """
+    Seeds the numba random number generator of the calling thread
+
+    Args:
+        seed (int): the seed to use
+
+    Returns:
+        None
+    """
+    np.random.seed(seed)
+
+
+@njit(cache=True)
+def _generate_random_rockets_type_allocation(rocket_type_allocation: np.ndarray, num_rocket_types: int) -> None:
+    """
+    Fills an allocation of rocket types in place with random rocket types
+
+    Args:
+        rocket_type_allocation (np.ndarray): the allocation of rocket types to fill
+        num_rocket_types (int): the number of different rocket types
+
+    Returns:
+        None
+    """
+    for i in range(rocket_type_allocation.shape[0]):
+        rocket_type_allocation[i] = np.random.randint(0, num_rocket_types)
+
+
+@njit(cache=True)
+def _generate_random_modules_allocation(module_allocation: np.ndarray, module_amounts: np.ndarray,
+                                        rocket_capacity: int) -> None:
+    """
+    Fills an allocation of modules in place with a random split of the modules among the rockets, which is then
+    repaired so that no rocket exceeds its capacity
+
+    Args:
+        module_allocation (np.ndarray): the allocation of modules to each rocket to fill
+        module_amounts (np.ndarray): the amount of each module type
+        rocket_capacity (int): the maximum capacity of each single rocket
+
+    Returns:
+        None
+    """
+    num_rockets, num_module_types = module_allocation.shape
+
+    probabilities = np.full(num_rockets, 1 / num_rockets)
+    for j in range(num_module_types):
+        module_counts = np.random.multinomial(module_amounts[j], probabilities)
+        for i in range(num_rockets):
+            module_allocation[i, j] = module_counts[i]
+
+    _repair(module_allocation, rocket_capacity)
+
+
+@njit(cache=True)
+def _generate_random_solution(rocket_type_allocation: np.ndarray, module_allocation: np.ndarray,
+                              module_amounts: np.ndarray, rocket_capacity: int, num_rocket_types: int) -> None:
+    """
+    Fills an allocation in place with a new random solution
+
+    Args:
+        rocket_type_allocation (np.ndarray): the allocation of rocket types to fill
+        module_allocation (np.ndarray): the allocation of modules to each rocket to fill
+        module_amounts (np.ndarray): the amount of each module type
+        rocket_capacity (int): the maximum capacity of each single rocket
+        num_rocket_types (int): the number of different rocket types
+
+    Returns:
+        None
+    """
+    _generate_random_rockets_type_allocation(rocket_type_allocation, num_rocket_types)
+    _generate_random_modules_allocation(module_allocation, module_amounts, rocket_capacity)
+
+
+# Compiled lazily on the first call, so that importing the module does not pay for the parallel compilation
+@njit(parallel=True, cache=True)
+def _simulate(rocket_type_allocations: np.ndarray, module_allocations: np.ndarray, costs: np.ndarray,
+              additional_fuel_costs: np.ndarray, fuel_costs: np.ndarray, module_amounts: np.ndarray,
+              rocket_capacity: int, iterations: int, seed: int, elite_sites: int, normal_sites: int, elite_site_size: int,
+              normal_site_size: int, module_moves: np.ndarray, rocket_changes: np.ndarray, best_module_moves: np.ndarray, best_rocket_changes: np.ndarray,
+              site_module_counts: np.ndarray) -> None:
+    """
+    Evolves a population of solutions in place for a given number of iterations of the bees algorithm. In every
+    iteration the best solutions are replaced by their best neighbours and the rest by new random solutions
+
+    Args:
+        rocket_type_allocations (np.ndarray): the rocket type allocations of the population, with shape
+                                              (population_size, num_rockets)
+        module_allocations (np.ndarray): the module allocations of the population, with shape
+                                         (population_size, num_rockets, num_module_types)
+        costs (np.ndarray): the total cost of each solution of the population
+        additional_fuel_costs (np.ndarray): the additional fuel costs for each rocket type and module type
+        fuel_costs (np.ndarray): the fuel costs for each rocket type
+        module_amounts (np.ndarray): the amount of each module type
+        rocket_capacity (int): the maximum capacity of each single rocket
+        iterations (int): the number of iterations to evolve the population
+        seed (int): the base seed of the random number generator, from which the seed of every iteration and solution
+                    of the population is derived
+        elite_sites (int): the number of elite sites that are maintained in the population
+        normal_sites (int): the number of normal sites that are maintained in the population
+        elite_site_size (int): the size of the elite site
+        normal_site_size (int): the size of each normal site
+        module_moves (np.ndarray): the buffer for the logs of module transfers of the neighbours, with shape
+                                   (population_size, modules_mutations, 4). Its second dimension sets the number of
+                                   mutations to perform on the modules allocation
+        rocket_changes (np.ndarray): the buffer for the logs of rocket type changes of the neighbours, with shape
+                                     (population_size, rockets_type_mutations, 3). Its second dimension sets the number
+                                     of mutations to perform on the rockets type allocation
+        best_module_moves (np.ndarray): the buffer for the logs of module transfers of the best neighbours, with the
+                                        same shape as module_moves
+        best_rocket_changes (np.ndarray): the buffer for the logs of rocket type changes of the best neighbours, with
+                                          the same shape as rocket_changes
+        site_module_counts (np.ndarray): the buffer for the number of modules in each rocket, with shape
+                                         (population_size, num_rockets)
+
+    Returns:
+        None
+    """
+    population_size, num_rockets, num_module_types = module_allocations.shape
+    num_rocket_types = fuel_costs.shape[0]
+    selected_count = min(elite_sites + normal_sites, population_size)
+
+    # Neighbours are kept as logs of their mutations over the site solution instead of full copies. Every solution of
+    # the population has its own rows of the buffers, so the sites can be processed in parallel
+    for iteration in range(iterations):
+        order = np.argsort(costs, kind='mergesort')[:selected_count]
+        rocket_type_allocations[:selected_count] = rocket_type_allocations[order]
+        module_allocations[:selected_count] = module_allocations[order]
+        costs[:selected_count] = costs[order]
+
+        for i in prange(population_size):
+            # Seeding every solution separately makes the results independent of how the threads are scheduled
+            np.random.seed((seed + iteration * population_size + i) % 2 ** 32)
+
+            if i >= selected_count:
+                _generate_random_solution(rocket_type_allocations[i], module_allocations[i], module_amounts,
+                                          rocket_capacity, num_rocket_types)
+                costs[i] = _cost(rocket_type_allocations[i], module_allocations[i], additional_fuel_costs,
+                                 fuel_costs)
+                continue
+
+            neighbours_count = elite_site_size if i < elite_sites else normal_site_size
+            best_cost = np.inf
+
+            # The module counts of the rockets are summed once per site and then only updated by the transfers
+            for r in range(num_rockets):
+                site_module_counts[i, r] = 0
+                for j in range(num_module_types):
+                    site_module_counts[i, r] += module_allocations[i, r, j]
+
+            # Each neighbour is created by mutating the site solution in place, costed from the cost changes of its
+            # mutations and then reverted
+            for _ in range(neighbours_count):
+                cost = costs[i] + _mutate_modules_allocation(
+                    rocket_type_allocations[i], module_allocations[i], site_module_counts[i], additional_fuel_costs,
+                    rocket_capacity, module_moves[i])
+                cost += _mutate_rockets_type_allocation(
+                    rocket_type_allocations[i], module_allocations[i], additional_fuel_costs, fuel_costs,
+                    rocket_changes[i])
+
+                _revert_mutations(rocket_type_allocations[i], module_allocations[i], site_module_counts[i],
+                                  module_moves[i], rocket_changes[i])
+
+                if cost < best_cost:
+                    best_cost = cost
+                    best_module_moves[i] = module_moves[i]
+                    best_rocket_changes[i] = rocket_changes[i]
+
+            # Neighbours win ties with the original solution
+            if best_cost <= costs[i]:
+                _apply_mutations(rocket_type_allocations[i], module_allocations[i], best_module_moves[i],
+                                 best_rocket_changes[i])
+                costs[i] = best_cost
@@ -1,4 +1,10 @@
 import numpy as np
+from typing import Optional
+
+from src.fastkernels import _cost, _seed, _generate_random_rockets_type_allocation, \
+    _generate_random_modules_allocation
+
+_RNG = np.random.default_rng()
 
 
 class Settings:
@@ -22,13 +28,18 @@ class Settings:
         Returns:
             None
         """
-        self.num_rocket_types = num_rocket_types
-        self.num_module_types = num_module_types
-        self.num_rockets = num_rockets
-        self.rocket_capacity = rocket_capacity
-        self.additional_fuel_costs = additional_fuel_costs
-        self.fuel_costs = fuel_costs
-        self.module_amounts = module_amounts
+        # Plain Python ints match the int64 arguments of the compiled kernels whatever integer type is given
+        self.num_rocket_types = int(num_rocket_types)
+        self.num_module_types = int(num_module_types)
+        self.num_rockets = int(num_rockets)
+        self.rocket_capacity = int(rocket_capacity)
+        self.additional_fuel_costs = np.asarray(additional_fuel_costs, dtype=np.float32)
+        self.fuel_costs = np.asarray(fuel_costs, dtype=np.float32)
+        self.module_amounts = np.asarray(module_amounts, dtype=np.int64)
+
+        # Rocket type allocations are stored as int8
+        if self.num_rocket_types > np.iinfo(np.int8).max + 1:
+            raise ValueError('Too many rocket types.')
 
 
 class Solution:
@@ -88,31 +99,61 @@ def calculate_cost(solution: Solution, settings: Settings) -> float:
     Returns:
         cost (float): the total cost of the solution
     """
-    additional_fuel_cost = np.sum(
-        solution.module_allocation * settings.additional_fuel_costs[solution.rocket_type_allocation, :])
-    rockets_fuel_cost = np.sum(settings.fuel_costs[solution.rocket_type_allocation])
-    return additional_fuel_cost + rockets_fuel_cost
+    # The kernel is compiled only for the dtypes used by the generated solutions
+    return _cost(np.asarray(solution.rocket_type_allocation, dtype=np.int8),
+                 np.asarray(solution.module_allocation, dtype=np.int32), settings.additional_fuel_costs,
+                 settings.fuel_costs)
+
+
+def batch_cost(rocket_type_allocations: np.ndarray, module_allocations: np.ndarray, settings: Settings) -> np.ndarray:
+    """
+    Calculates the total costs of many solutions at once
+
+    Args:
+        rocket_type_allocations (np.ndarray): the stacked allocations of rocket types, with shape
+                                              (num_solutions, num_rockets)
+        module_allocations (np.ndarray): the stacked allocations of modules to each rocket, with shape
+                                         (num_solutions, num_rockets, num_module_types)
+        settings (Settings): the settings of the problem
+
+    Returns:
+        costs (np.ndarray): the total cost of each solution
+    """
+    additional_fuel_costs = np.take(settings.additional_fuel_costs, rocket_type_allocations, axis=0)
+    return np.einsum('kij,kij->k', module_allocations, additional_fuel_costs) + \
+        settings.fuel_costs[rocket_type_allocations].sum(axis=1)
 
 
-def generate_random_rockets_type_allocation(settings: Settings) -> np.ndarray:
+def generate_random_rockets_type_allocation(settings: Settings,
+                                            rng: Optional[np.random.Generator] = None) -> np.ndarray:
     """
     Generates a random allocation of rocket types
 
     Args:
         settings (Settings): the settings of the problem
+        rng (np.random.Generator, optional): the random number generator to draw from, a module-wide one is used
+                                             if not given
 
     Returns:
         rockets_type_allocation (np.ndarray): the allocation of rocket types
     """
-    return np.random.randint(low=0, high=settings.num_rocket_types, size=settings.num_rockets)
+    allocation = np.empty(settings.num_rockets, dtype=np.int8)
+
+    # The compiled generator is seeded from rng, so that all random draws come from a single source
+    _seed((_RNG if rng is None else rng).integers(2 ** 32))
+    _generate_random_rockets_type_allocation(allocation, settings.num_rocket_types)
+
+    return allocation
 
 
-def generate_random_modules_allocation(settings: Settings) -> np.ndarray:
+def generate_random_modules_allocation(settings: Settings, rng: Optional[np.random.Generator] = None) -> np.ndarray:
     """
     Generates a random allocation of modules to rockets
 
     Args:
         settings (Settings): the settings of the problem
+        rng (np.random.Generator, optional): the random number generator to draw from, a module-wide one is used
+                                             if not given
 
     Returns:
         modules_allocation (np.ndarray): the allocation of modules to rockets
@@ -120,43 +161,29 @@ def generate_random_modules_allocation(settings: Settings) -> np.ndarray:
     if settings.num_rockets * settings.rocket_capacity < settings.module_amounts.sum():
         raise ValueError('Not enough capacity to carry all modules.')
 
-    allocation = np.zeros((settings.num_rockets, settings.num_module_types), dtype=np.int32)
-
-    for module_type, amount in enumerate(settings.module_amounts):
-        allocation[:, module_type] = np.random.multinomial(amount, np.ones(settings.num_rockets) / settings.num_rockets)
-
-    while np.any(allocation.sum(axis=1) > settings.rocket_capacity):
-        rocket_module_counts = allocation.sum(axis=1)
-
-        # Find the rocket with the most modules and the one with the least modules
-        max_rocket_index = np.argmax(rocket_module_counts)
-        min_rocket_index = np.argmin(rocket_module_counts)
-
-        # Find the module type with the most amount of modules in the rocket with the most modules
-        module_index = np.argmax(allocation[max_rocket_index])
-
-        # Calculate the amount of modules that need to be transferred
-        num_modules_to_transfer = min(allocation[max_rocket_index, module_index],
-                                      rocket_module_counts[max_rocket_index] - settings.rocket_capacity)
+    allocation = np.empty((settings.num_rockets, settings.num_module_types), dtype=np.int32)
 
-        # Transfer the modules from the rocket with the most modules to the one with the least
-        allocation[max_rocket_index, module_index] -= num_modules_to_transfer
-        allocation[min_rocket_index, module_index] += num_modules_to_transfer
+    # The compiled generator is seeded from rng, so that all random draws come from a single source
+    _seed((_RNG if rng is None else rng).integers(2 ** 32))
+    _generate_random_modules_allocation(allocation, settings.module_amounts, settings.rocket_capacity)
 
     return allocation
 
 
-def generate_random_solution(settings: Settings) -> Solution:
+def generate_random_solution(settings: Settings, rng: Optional[np.random.Generator] = None) -> Solution:
     """
     Generates a random solution for the optimization problem
 
     Args:
         settings (Settings): the settings of the problem
+        rng (np.random.Generator, optional): the random number generator to draw from, a module-wide one is used
+                                             if not given
 
     Returns:
         solution (Solution): the generated solution
     """
-    solution = Solution(generate_random_rockets_type_allocation(settings), generate_random_modules_allocation(settings))
+    solution = Solution(generate_random_rockets_type_allocation(settings, rng),
+                        generate_random_modules_allocation(settings, rng))
 
     if not (is_valid_capacity(solution, settings) and is_valid_module_total(solution, settings)):
         raise RuntimeError('Solution is not valid.')